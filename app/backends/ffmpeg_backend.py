@@ -1,16 +1,23 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+import os
+import subprocess
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Protocol, runtime_checkable, cast
+from typing import Optional, Protocol, cast
 
 import ffmpeg
+from PIL import Image
 
-from app.utils import Timer, log_exception, ensure_folder
+from app.utils import Timer, log_exception, ensure_folder, concat_wavs
 
 
-@runtime_checkable
 class _Filterable(Protocol):
-    """Minimal protocol for ffmpeg-python streams used here."""
+    """Minimal protocol for ffmpeg-python streams used here (hints only)."""
 
     def filter(self, name: str, *args, **kwargs) -> "_Filterable": ...
     def filter_multi_output(self, name: str, *args, **kwargs) -> list["_Filterable"]: ...
@@ -131,6 +138,148 @@ class FClip:
         return self
 
 
+# wave's sample width -> the codec name ffprobe would report
+_WAV_CODECS = {1: "pcm_u8", 2: "pcm_s16le", 3: "pcm_s24le", 4: "pcm_s32le"}
+
+
+@functools.lru_cache(maxsize=None)
+def _audio_stream_info(path: str) -> dict:
+    """Probe an audio file once for duration + codec params (cached)."""
+    # .wav headers (TTS output, generated silence) can be read in-process
+    # with the stdlib instead of spawning ffprobe per file
+    if path.lower().endswith(".wav"):
+        try:
+            with wave.open(path, "rb") as w:
+                rate = w.getframerate()
+                return {
+                    "duration": w.getnframes() / rate,
+                    "codec_name": _WAV_CODECS.get(w.getsampwidth()),
+                    "sample_rate": str(rate),
+                    "channels": w.getnchannels(),
+                }
+        except (wave.Error, EOFError):
+            pass  # exotic/compressed wav: fall through to ffprobe
+
+    # restrict ffprobe to the first audio stream and just the fields we
+    # read, so it neither decodes nor reports the rest of the container
+    probe = ffmpeg.probe(
+        path,
+        select_streams="a:0",
+        show_entries="stream=codec_type,codec_name,sample_rate,channels,duration",
+    )
+    for stream in probe["streams"]:
+        if stream["codec_type"] == "audio":
+            return {
+                "duration": float(stream["duration"]),
+                "codec_name": stream.get("codec_name"),
+                "sample_rate": stream.get("sample_rate"),
+                "channels": stream.get("channels"),
+            }
+    raise RuntimeError(f"Could not determine audio stream of {path}")
+
+
+def _audio_duration(path: str) -> float:
+    return _audio_stream_info(path)["duration"]
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder_works(encoder: str) -> bool:
+    """
+    One-frame probe encode to null output. Being listed in -encoders only
+    proves compile-time support — full ffmpeg builds list NVENC/QSV on
+    machines with no such GPU, where every real invocation would fail.
+    """
+    try:
+        res = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error",
+             "-f", "lavfi", "-i", "color=black:size=64x64:rate=1",
+             "-frames:v", "1", "-c:v", encoder, "-f", "null", "-"],
+            capture_output=True, timeout=15,
+        )
+        return res.returncode == 0
+    except Exception:
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def detect_best_encoder() -> str:
+    """
+    Pick the best USABLE H.264 encoder once per process: hardware
+    (NVENC > QSV) when a probe encode actually succeeds, else libx264.
+    h264_vaapi is deliberately not on the ladder — it needs a VAAPI
+    device and an nv12 hwupload in the filtergraph that this pipeline
+    does not wire up, so auto-selecting it would pick an encoder whose
+    every invocation fails.
+    """
+    for enc in ("h264_nvenc", "h264_qsv"):
+        if _encoder_works(enc):
+            return enc
+    return "libx264"
+
+
+def _quality_kwargs(vcodec: str, preset: str, tune: str, cq: int) -> dict:
+    """
+    Map the config's NVENC-style quality knobs (p-preset, tune, cq) onto
+    whichever encoder is in use; non-NVENC encoders reject those option
+    names, so cq becomes global_quality/qp/crf as appropriate.
+    """
+    if vcodec.endswith("_nvenc"):
+        return {"preset": preset, "tune": tune, "cq": cq}
+    if vcodec.endswith("_qsv"):
+        return {"preset": "medium", "global_quality": cq}
+    if vcodec.endswith("_vaapi"):
+        return {"qp": cq}
+    return {"preset": "medium", "crf": cq}
+
+
+# lines of ffmpeg stderr kept for failure messages; everything older falls
+# off the ring buffer, so memory stays bounded however long the encode runs
+_STDERR_TAIL_LINES = 512
+
+
+def _run_stream(stream, *, verbose: bool, capture_stderr: bool, label: str = "ffmpeg"):
+    """
+    Run a compiled ffmpeg-python stream to completion. With capture_stderr,
+    stderr is drained into a bounded deque of recent lines — a long encode
+    never accumulates its full log in memory — and the tail is attached to
+    the exception on failure. stdin is detached so ffmpeg can't stall on
+    the console.
+    """
+    argv = stream.compile()
+    if capture_stderr:
+        tail: deque = deque(maxlen=_STDERR_TAIL_LINES)
+        proc = subprocess.Popen(
+            argv, stdin=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, bufsize=0,
+        )
+        for line in proc.stderr:
+            tail.append(line)
+        proc.wait()
+    else:
+        tail = deque()
+        proc = subprocess.Popen(
+            argv, stdin=subprocess.DEVNULL,
+            stderr=None if verbose else subprocess.DEVNULL,
+        )
+        proc.wait()
+    if proc.returncode != 0:
+        msg = b"".join(tail).decode(errors="replace")
+        raise RuntimeError(f"{label} failed (exit {proc.returncode}):\n{msg}")
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder_supports(encoder: str, option: str) -> bool:
+    """One-time probe of ffmpeg's encoder help for an option name."""
+    try:
+        res = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-h", f"encoder={encoder}"],
+            capture_output=True, text=True, timeout=10,
+        )
+        return option in res.stdout
+    except Exception:
+        return False
+
+
 class Timeline:
     """
     Sequence of FClips that can be rendered with crossfades or hard cuts.
@@ -142,13 +291,103 @@ class Timeline:
         self.clips = clips
 
     @staticmethod
-    def get_audio_duration(path: Path) -> float:
-        """Return duration (in seconds) of an audio file using ffprobe."""
-        probe = ffmpeg.probe(str(path))
-        for stream in probe["streams"]:
-            if stream["codec_type"] == "audio":
-                return float(stream["duration"])
-        raise RuntimeError(f"Could not determine duration of {path}")
+    def get_audio_duration(path: str | Path) -> float:
+        """Return duration (in seconds) of an audio file using ffprobe (cached)."""
+        return _audio_duration(str(path))
+
+    @staticmethod
+    def _segment_cache_key(clip: FClip, *parts) -> str:
+        """
+        Hash everything that affects a segment's bytes: source file identity
+        (size + mtime, no content read) plus the crop/canvas/encode params.
+        blake2b is stdlib and fast enough for a handful of stat tuples.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        for p in (clip.image_path, clip.a_paths[0]):
+            st = Path(p).stat()
+            h.update(f"{p}:{st.st_size}:{st.st_mtime_ns};".encode())
+        h.update(repr(parts).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def _probe_all_audio(paths: list[str | Path]) -> dict[str, float]:
+        """
+        Probe every audio file in one concurrent batch instead of serially
+        on demand. Results land in the lru_cache, so later per-clip
+        get_audio_duration calls are dict hits with no subprocess spawn.
+        """
+        path_strs = [str(p) for p in paths]
+        uncached = list(dict.fromkeys(path_strs))
+        if len(uncached) > 1:
+            with ThreadPoolExecutor(max_workers=min(8, len(uncached))) as pool:
+                list(pool.map(_audio_stream_info, uncached))
+        return {p: _audio_stream_info(p)["duration"] for p in path_strs}
+
+    def _audio_out_kwargs(self, acodec: str, audio_bitrate: str) -> dict:
+        """
+        Pick the cheapest legal audio output: when every source is already
+        AAC with matching sample rate and channel count, stream-copy it
+        instead of re-encoding (also required for the concat-copy mux to
+        keep audio untouched). Otherwise encode to AAC at a fixed rate and
+        layout: segments are later joined by stream copy, which is only
+        legal when every segment's audio parameters are identical, so the
+        encode must not inherit each source's own rate/channels.
+        """
+        try:
+            infos = [
+                _audio_stream_info(str(c.a_paths[0]))
+                for c in self.clips if c.a_paths
+            ]
+        except Exception:
+            infos = []
+        if (
+            infos
+            and len(infos) == len(self.clips)
+            and all(i["codec_name"] == "aac" for i in infos)
+            and len({(i["sample_rate"], i["channels"]) for i in infos}) == 1
+        ):
+            return {"acodec": "copy"}
+        return {
+            "acodec": acodec, "audio_bitrate": audio_bitrate,
+            "ar": 48000, "ac": 2,
+        }
+
+    @staticmethod
+    def _scale_source(image_path: Path, inner_w: int) -> Image.Image:
+        """
+        Decode + scale the source page once. Every clip on the same page
+        crops a different window of this one image, so the expensive
+        JPEG decode and LANCZOS resize must not be repeated per clip.
+        """
+        with Image.open(image_path) as im:
+            im = im.convert("RGB")
+            new_h = max(1, round(im.height * inner_w / im.width))
+            return im.resize((inner_w, new_h), Image.LANCZOS)
+
+    @staticmethod
+    def _bake_canvas(
+        scaled: Image.Image,
+        out_png: Path,
+        *,
+        full_w: int,
+        vh: int,
+        oy: int,
+        side_margin_px: int,
+    ) -> Path:
+        """
+        Render a pre-scaled source image to the exact output canvas (crop
+        the viewport window at offset oy, pillarbox onto a black full-width
+        canvas) and save it as a PNG for ffmpeg to loop.
+        """
+        inner_w = scaled.width
+        window = scaled.crop((0, oy, inner_w, min(oy + vh, scaled.height)))
+
+        canvas = Image.new("RGB", (full_w, vh), (0, 0, 0))
+        canvas.paste(window, (side_margin_px, 0))
+        # throwaway intermediate read back once by ffmpeg: minimal zlib
+        # effort keeps it lossless while skipping most of the PNG encode cost
+        canvas.save(out_png, compress_level=1)
+        return out_png
 
     def render(
         self,
@@ -156,7 +395,7 @@ class Timeline:
         *,
         fps: int = 24,
         vcodec: str = "h264_nvenc",
-        preset: str = "p5",
+        preset: str = "p7",
         tune: str = "hq",
         cq: int = 23,
         pix_fmt: str = "yuv420p",
@@ -168,15 +407,40 @@ class Timeline:
         capture_stdout: bool = False,
         show_progress: bool = False,
         side_margin_px: int = None,
-        keep_segments: bool = False
+        keep_segments: bool = False,
+        cuda_filters: bool = False,
+        split_encode_mode: int = 0,
+        threads: int = 0,
+        nvenc_surfaces: int = 0,
+        single_pass: bool = True,
+        encode_jobs: int = 0,
+        resume: bool = True
     ) -> Path:
         """
-        Encode each (image+audio) pair as its own segment with per-clip:
+        Render the timeline. By default this is the single-invocation path
+        (pre-baked canvases + concat demuxer, one NVENC session, no
+        intermediate segments). Set single_pass=False for the per-segment
+        pipeline with its content-hash cache, which each clip renders as:
         1) scale to inner width (viewport_w - side margins)
         2) optional pad to full viewport (pillarbox)
         3) crop vertical window at offset_y of viewport_h
-        Then concat all segments with stream copy.
+        then concats all segments with stream copy.
         """
+        if single_pass:
+            return self.render_single_pass(
+                out_path,
+                fps=fps, vcodec=vcodec, preset=preset, tune=tune, cq=cq,
+                pix_fmt=pix_fmt, acodec=acodec, audio_bitrate=audio_bitrate,
+                verbose=verbose,
+                capture_stderr=capture_stderr, capture_stdout=capture_stdout,
+                side_margin_px=side_margin_px,
+                keep_segments=keep_segments,
+                cuda_filters=cuda_filters,
+                split_encode_mode=split_encode_mode,
+                threads=threads,
+                nvenc_surfaces=nvenc_surfaces,
+            )
+
         out_path = Path(out_path)
         ensure_folder(out_path.parent)
 
@@ -195,126 +459,382 @@ class Timeline:
             raise ValueError(f"side_margin_px too large: inner_w would be {inner_w}")
 
         seg_files: list[Path] = []
-        concat_list = out_path.parent / "files.txt"
-
-        try:
-            # build each segment independently
-            for i, clip in enumerate(self.clips):
-                if not clip.image_path or not clip.a_paths:
-                    raise ValueError("FClip missing image_path or a_paths")
+        seg_dir = out_path.parent
+        cache_dir = seg_dir / ".manganarrator_cache"
+        ensure_folder(cache_dir)
+
+        # loop-invariant encoder settings, built once instead of per segment
+        # (static content: no B-frames, one GOP per segment)
+        enc_static = {"bf": 0}
+        if vcodec.endswith("_nvenc"):
+            enc_static.update({
+                "rc": "vbr",
+                "multipass": "fullres",
+                "spatial_aq": 1,
+                "rc-lookahead": 8,
+                # an IDR at the start of each segment so concat-copy stays legal
+                "forced-idr": 1,
+            })
+            # intra-frame parallelism across NVENC engines (Ada+); only pass
+            # it when this ffmpeg build actually knows the option
+            if split_encode_mode and _encoder_supports(vcodec, "split_encode_mode"):
+                enc_static["split_encode_mode"] = split_encode_mode
+            if nvenc_surfaces:
+                enc_static["surfaces"] = nvenc_surfaces
+        if threads:
+            enc_static["threads"] = threads
+        quality = _quality_kwargs(vcodec, preset, tune, cq)
+        base_input_kwargs = {"loop": 1, "framerate": 1}
+        if cuda_filters:
+            base_input_kwargs["extra_hw_frames"] = 64
+
+        # precompute the whole job plan (validation + path strings) before
+        # any subprocess is spawned, then warm the probe cache in one batch
+        # and decide whether audio can be stream-copied
+        for clip in self.clips:
+            if not clip.image_path or not clip.a_paths:
+                raise ValueError("FClip missing image_path or a_paths")
+        audio_strs = [str(c.a_paths[0]) for c in self.clips]
+        self._probe_all_audio(audio_strs)
+        audio_out = self._audio_out_kwargs(acodec, audio_bitrate)
+
+        # decode + scale each distinct page once up front; the worker
+        # threads then only crop/paste (Image.crop copies, so sharing the
+        # scaled image across threads is safe)
+        scaled_sources = {
+            p: self._scale_source(p, inner_w)
+            for p in dict.fromkeys(c.image_path for c in self.clips)
+        }
+
+        def _encode_segment(i: int, clip: FClip, key: str) -> Path:
+            """Encode one (image+audio) pair to its own cached segment."""
+            oy = int(clip.offset_y or 0)
+            vh = int(clip.viewport_h or full_h)
+
+            seg_out = cache_dir / f"seg_{key}.ts"
+            # checkpoint/resume: segments land in the cache under an atomic
+            # rename, so anything present is complete and an interrupted
+            # run only re-encodes what it never finished. resume=False
+            # forces a clean re-encode of every segment.
+            if resume and seg_out.exists():
+                if verbose:
+                    print(f"[SEG {i:02d}] cache hit → {seg_out.name}")
+                return seg_out
+
+            # encode to a temp name and rename on success so an interrupted
+            # run never leaves a half-written file that looks like a hit
+            seg_tmp = cache_dir / f"seg_{key}.tmp.ts"
+            audio_str = audio_strs[i]
+
+            # duration is known up front from the audio, so tell ffmpeg the
+            # exact image-track length instead of relying on -shortest alone
+            dur = self.get_audio_duration(audio_str)
+
+            # Pre-bake the final canvas once in Python: the image is static,
+            # so running scale/crop/pad in libavfilter per output frame is
+            # pure waste. ffmpeg just loops the already-correct PNG.
+            prebaked = seg_out.with_suffix(".png")
+            self._bake_canvas(
+                scaled_sources[clip.image_path], prebaked,
+                full_w=full_w, vh=vh,
+                oy=oy, side_margin_px=side_margin_px,
+            )
 
-                oy = int(clip.offset_y or 0)
-                vw = int(clip.viewport_w or full_w)
-                vh = int(clip.viewport_h or full_h)
+            # Feed the still at 1 fps and let the fps filter duplicate it to
+            # the output rate: with one IDR per segment and a GOP spanning
+            # the whole duration, NVENC emits cheap P-frames that just
+            # reference the first frame instead of re-encoding it.
+            # no format node: the decoder's RGB output goes straight through
+            # and the single RGB→YUV conversion happens at the encoder input
+            # (on-GPU when frames are CUDA-uploaded), instead of an extra
+            # libswscale pass per frame
+            v = (
+                ffmpeg
+                .input(str(prebaked), t=dur, **base_input_kwargs)
+                .filter("fps", fps)
+                .filter("setpts", "N/FRAME_RATE/TB")
+            )
 
-                seg_out = out_path.parent / f"seg_{i}.mp4"
+            # Upload once and keep frames on-device: NVENC accepts CUDA
+            # frames directly, so there is no per-frame PCIe round trip.
+            if cuda_filters:
+                v = v.filter("hwupload_cuda")
+
+            a = ffmpeg.input(audio_str)
+
+            out = ffmpeg.output(
+                v, a, str(seg_tmp),
+                vcodec=vcodec, format="mpegts",
+                pix_fmt=pix_fmt, shortest=None, r=fps,
+                # NVENC ignores -cq unless an explicit rc mode is set;
+                # vbr + fullres multipass unlocks the real CQ path
+                g=max(1, int(fps * dur)),
+                **quality,
+                **audio_out,
+                **enc_static
+            )
+            if cuda_filters:
+                out = out.global_args(
+                    "-init_hw_device", "cuda=cuda_dev:0",
+                    "-filter_hw_device", "cuda_dev",
+                )
 
-                # 1) scale to the inner width (content area) – height follows aspect
-                v = (
-                    ffmpeg
-                    .input(str(clip.image_path), loop=1, framerate=fps)
-                    .filter("scale", inner_w, -1)
+            try:
+                _run_stream(
+                    out.overwrite_output(),
+                    verbose=verbose, capture_stderr=capture_stderr,
+                    label=f"ffmpeg ({seg_out.name})",
                 )
+            except Exception:
+                seg_tmp.unlink(missing_ok=True)
+                raise
+            os.replace(seg_tmp, seg_out)
+
+            if verbose:
+                print(f"[SEG {i:02d}] {seg_out.name} audio ~ {dur:.2f}s")
 
-                # 2) crop a viewport-tall slice at offset_y using the inner width (no margins yet)
-                v = v.filter("crop", inner_w, vh, 0, oy)
-
-                # 3) pad horizontally to full viewport width with side margins (height is now exactly vh)
-                if side_margin_px > 0:
-                    v = v.filter(
-                        "pad",
-                        full_w,         # target width (inner + margins)
-                        vh,             # target height (same as cropped viewport)
-                        side_margin_px, # x offset = left margin
-                        0,              # y offset = no top pad
-                        "black"
-                    )
-
-                # 4) pixel format last
-                v = v.filter("format", pix_fmt)
-
-                a = ffmpeg.input(str(clip.a_paths[0]))
-
-                (
-                    ffmpeg
-                    .output(
-                        v, a, str(seg_out),
-                        vcodec=vcodec, preset=preset, tune=tune, cq=cq,
-                        pix_fmt=pix_fmt, shortest=None, r=fps,
-                        acodec=acodec, audio_bitrate=audio_bitrate
-                    )
-                    .overwrite_output()
-                    .run(
-                        quiet=False,                # keep logs on while stabilizing
-                        capture_stderr=capture_stderr,
-                        capture_stdout=capture_stdout
-                    )
+            return seg_out
+
+        try:
+            # segments are content-addressed: identical inputs + params on a
+            # re-run reuse the cached encode instead of hitting NVENC again.
+            # Identical clips within ONE render (e.g. pre/post-roll sharing a
+            # silence file on a short page) collapse to the same key, so
+            # dedupe before dispatch — two workers must never write the same
+            # tmp/baked files concurrently.
+            keys = [
+                self._segment_cache_key(
+                    clip,
+                    int(clip.offset_y or 0), int(clip.viewport_h or full_h),
+                    inner_w, full_w, side_margin_px,
+                    fps, vcodec, preset, tune, cq, pix_fmt,
+                    tuple(sorted(audio_out.items())),
                 )
+                for clip in self.clips
+            ]
+            unique_jobs: dict[str, tuple[int, FClip]] = {}
+            for i, (clip, key) in enumerate(zip(self.clips, keys)):
+                unique_jobs.setdefault(key, (i, clip))
+
+            # encode segments concurrently; ffmpeg runs as subprocesses so
+            # threads are enough to overlap the NVENC sessions. encode_jobs
+            # bounds the fan-out (jobs x ffmpeg threads ~ core count).
+            max_workers = min(len(unique_jobs), encode_jobs or (os.cpu_count() or 1))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {
+                    key: pool.submit(_encode_segment, i, clip, key)
+                    for key, (i, clip) in unique_jobs.items()
+                }
+                encoded = {key: f.result() for key, f in futures.items()}
+            seg_files = [encoded[key] for key in keys]
+
+            # ---- concat protocol + stream copy (no second encode pass) ----
+            # MPEG-TS is built for back-to-back byte concatenation, so the
+            # final mux reads the segments as one stream and copies it into
+            # the mp4; aac_adtstoasc rewrites the TS-style ADTS audio
+            # headers to the MP4 form without touching the samples.
+            concat_src = "concat:" + "|".join(str(p) for p in seg_files)
+            _run_stream(
+                ffmpeg
+                .input(concat_src)
+                .output(str(out_path), **{"c": "copy", "bsf:a": "aac_adtstoasc"})
+                .overwrite_output(),
+                verbose=verbose, capture_stderr=capture_stderr,
+                label="ffmpeg (concat)",
+            )
+
+            # cleanup baked frames; cached segment .ts files stay behind so
+            # re-renders with unchanged inputs can skip the encode entirely
+            for p in seg_files:
+                try:
+                    p.with_suffix(".png").unlink(missing_ok=True)
+                except Exception:
+                    pass
+
+            return out_path
 
-                # For debuggin, log audio duration
+        except Exception:
+            log_exception(f"Timeline.render({out_path})")
+            # attempt cleanup on failure (best-effort); drop baked frames
+            # but leave completed cached segments reusable
+            for p in seg_files:
                 try:
-                    dur = self.get_audio_duration(seg_out)
-                    if verbose:
-                        print(f"[SEG {i:02d}] {seg_out.name} audio ~ {dur:.2f}s")
+                    p.with_suffix(".png").unlink(missing_ok=True)
                 except Exception:
-                    if verbose:
-                        print(f"[SEG {i:02d}] {seg_out.name} audio duration probe failed")
-
-                # Finally concat the segment
-                seg_files.append(seg_out)
-
-                # ---- filter-concat (re-encode once) ----
-                inputs = [ffmpeg.input(str(p)) for p in seg_files]
-                vstreams = [inp.video for inp in inputs]
-                astreams = [inp.audio for inp in inputs]
-
-                vcat = ffmpeg.filter(vstreams, 'concat', n=len(seg_files), v=1, a=0)
-                acat = ffmpeg.filter(astreams, 'concat', n=len(seg_files), v=0, a=1)
-
-                (
-                    ffmpeg
-                    .output(
-                        vcat, acat, str(out_path),
-                        vcodec=vcodec, preset=preset, tune=tune, cq=cq,
-                        pix_fmt=pix_fmt, r=fps,
-                        acodec=acodec, audio_bitrate=audio_bitrate
-                    )
-                    .overwrite_output()
-                    .run(
-                        quiet=not verbose,
-                        capture_stderr=capture_stderr,
-                        capture_stdout=capture_stdout
-                    )
+                    pass
+            raise
+
+    def render_single_pass(
+        self,
+        out_path: str | Path,
+        *,
+        fps: int = 24,
+        vcodec: str = "h264_nvenc",
+        preset: str = "p7",
+        tune: str = "hq",
+        cq: int = 23,
+        pix_fmt: str = "yuv420p",
+        acodec: str = "aac",
+        audio_bitrate: str = "192k",
+        verbose: bool = True,
+        capture_stderr: bool = False,
+        capture_stdout: bool = False,
+        side_margin_px: int = None,
+        keep_segments: bool = False,
+        cuda_filters: bool = False,
+        split_encode_mode: int = 0,
+        threads: int = 0,
+        nvenc_surfaces: int = 0
+    ) -> Path:
+        """
+        Render the whole timeline with ONE ffmpeg invocation: all canvases
+        are pre-baked, then fed through the concat demuxer as a timed image
+        sequence alongside a concat list of the audio files. A single NVENC
+        session is opened instead of one per segment, so codec init and
+        process setup/teardown are paid once for the entire timeline.
+        """
+        out_path = Path(out_path)
+        ensure_folder(out_path.parent)
+
+        if not self.clips:
+            raise ValueError("Timeline has no clips to render.")
+
+        first = self.clips[0]
+        full_w = int(first.viewport_w or 1080)
+        full_h = int(first.viewport_h or 1920)
+        side_margin_px = side_margin_px if side_margin_px else 0
+
+        inner_w = full_w - (2 * side_margin_px)
+        if inner_w <= 0:
+            raise ValueError(f"side_margin_px too large: inner_w would be {inner_w}")
+
+        work_dir = out_path.parent
+        video_list = work_dir / "frames.txt"
+        frame_files: list[Path] = []
+
+        try:
+            self._probe_all_audio([c.a_paths[0] for c in self.clips if c.a_paths])
+
+            # one decode + scale per distinct page; clips just crop it
+            scaled_sources = {
+                p: self._scale_source(p, inner_w)
+                for p in dict.fromkeys(c.image_path for c in self.clips)
+            }
+
+            durations: list[float] = []
+            for i, clip in enumerate(self.clips):
+                if not clip.image_path or not clip.a_paths:
+                    raise ValueError("FClip missing image_path or a_paths")
+                durations.append(self.get_audio_duration(clip.a_paths[0]))
+
+                frame_png = work_dir / f"frame_{i}.png"
+                self._bake_canvas(
+                    scaled_sources[clip.image_path], frame_png,
+                    full_w=full_w,
+                    vh=int(clip.viewport_h or full_h),
+                    oy=int(clip.offset_y or 0),
+                    side_margin_px=side_margin_px,
                 )
+                frame_files.append(frame_png)
+
+            # concat demuxer: one timed entry per baked frame (the trailing
+            # repeat of the last file is the demuxer's way of closing the
+            # final duration)
+            with open(video_list, "w", encoding="utf-8") as f:
+                for png, dur in zip(frame_files, durations):
+                    f.write(f"file '{png.name}'\nduration {dur:.6f}\n")
+                f.write(f"file '{frame_files[-1].name}'\n")
+
+            # merge uniform PCM WAVs in-process so ffmpeg opens one audio
+            # input instead of demuxing N files
+            merged_wav = concat_wavs(
+                [c.a_paths[0] for c in self.clips],
+                work_dir / "audio_merged.wav",
+            )
 
+            v = (
+                ffmpeg
+                .input(str(video_list), format="concat", safe=0)
+                .filter("fps", fps)
+            )
+            if cuda_filters:
+                v = v.filter("hwupload_cuda")
 
+            if merged_wav is not None:
+                a = ffmpeg.input(str(merged_wav))
+            else:
+                # mixed sample rates/layouts: the concat DEMUXER would read
+                # every file with the first file's parameters (22.05 kHz
+                # dialogue after 48 kHz silence plays ~2x fast); the concat
+                # FILTER decodes each input and lets the graph resample
+                # them to a common format before joining
+                a = ffmpeg.concat(
+                    *[ffmpeg.input(str(c.a_paths[0])) for c in self.clips],
+                    v=0, a=1,
+                )
 
+            enc_kwargs = {"bf": 0}
+            if vcodec.endswith("_nvenc"):
+                enc_kwargs.update({
+                    "rc": "vbr",
+                    "multipass": "fullres",
+                    "spatial_aq": 1,
+                    "rc-lookahead": 8,
+                })
+                if split_encode_mode and _encoder_supports(vcodec, "split_encode_mode"):
+                    enc_kwargs["split_encode_mode"] = split_encode_mode
+                if nvenc_surfaces:
+                    enc_kwargs["surfaces"] = nvenc_surfaces
+            if threads:
+                enc_kwargs["threads"] = threads
+
+            out = ffmpeg.output(
+                v, a, str(out_path),
+                vcodec=vcodec,
+                pix_fmt=pix_fmt, shortest=None, r=fps,
+                **_quality_kwargs(vcodec, preset, tune, cq),
+                **self._audio_out_kwargs(acodec, audio_bitrate),
+                **enc_kwargs
+            )
+            if cuda_filters:
+                out = out.global_args(
+                    "-init_hw_device", "cuda=cuda_dev:0",
+                    "-filter_hw_device", "cuda_dev",
+                )
+
+            with Timer(f"🎞 Single-pass encode ({len(self.clips)} clips)",
+                       use_spinner=not verbose):
+                _run_stream(
+                    out.overwrite_output(),
+                    verbose=verbose, capture_stderr=capture_stderr,
+                    label="ffmpeg (single-pass)",
+                )
 
-            # cleanup temporary files unless told to keep
             if not keep_segments:
-                for p in seg_files:
+                for p in frame_files:
                     try:
                         p.unlink(missing_ok=True)
                     except Exception:
                         pass
-                try:
-                    concat_list.unlink(missing_ok=True)
-                except Exception:
-                    pass
+                for lst in (video_list, work_dir / "audio_merged.wav"):
+                    try:
+                        lst.unlink(missing_ok=True)
+                    except Exception:
+                        pass
 
             return out_path
 
         except Exception:
-            log_exception(f"Timeline.render({out_path})")
-            # attempt cleanup on failure (best-effort)
+            log_exception(f"Timeline.render_single_pass({out_path})")
             if not keep_segments:
-                for p in seg_files:
+                for p in frame_files:
                     try:
                         p.unlink(missing_ok=True)
                     except Exception:
                         pass
-                try:
-                    concat_list.unlink(missing_ok=True)
-                except Exception:
-                    pass
+                for lst in (video_list, work_dir / "audio_merged.wav"):
+                    try:
+                        lst.unlink(missing_ok=True)
+                    except Exception:
+                        pass
             raise
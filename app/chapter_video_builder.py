@@ -1,12 +1,85 @@
 from pathlib import Path
+import hashlib
 import json, re
+import os
+import shutil
+
+import numpy as np
+
+try:
+    import ijson   # optional: incremental parsing for very large OCR files
+except ImportError:
+    ijson = None
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Tuple
+from app.backends.ffmpeg_backend import detect_best_encoder
 from app.video_runner import VideoRunner
 from app.config import VideoConfig
 from typing import Optional
-import subprocess, shlex
+import struct
+
+
+_VER_RE = re.compile(r"v(\d+)")
+
 
+def _load_chapter_data(json_file: Path) -> Dict[str, Any]:
+    """
+    Parse a chapter's OCR JSON keeping only the fields this pipeline reads.
+    With ijson installed the FIRST array item is streamed in one pass
+    (header scalars plus dialogues trimmed to id + bbox y1), so peak memory
+    stays constant instead of O(file size). Falls back to plain json.loads
+    otherwise — both paths read item [0] only.
+    """
+    if ijson is None:
+        return json.loads(json_file.read_text(encoding="utf-8"))[0]
 
+    wanted = {
+        "run_id", "image_rel_path_from_root", "image_file_name",
+        "image_width", "image_height",
+    }
+    data: Dict[str, Any] = {"parsed_dialogue": []}
+    dlg: Optional[Dict[str, Any]] = None
+    with json_file.open("rb") as f:
+        for prefix, event, value in ijson.parse(f):
+            # 'item' prefixes repeat for every top-level array element;
+            # stop at the first item's end_map so a multi-item file can't
+            # bleed later items into this chapter (matching the fallback)
+            if prefix == "item" and event == "end_map":
+                break
+            if prefix == "item.parsed_dialogue.item":
+                if event == "start_map":
+                    dlg = {"id": None, "paddle_bbox": None}
+                elif event == "end_map" and dlg is not None:
+                    data["parsed_dialogue"].append(dlg)
+                    dlg = None
+            elif dlg is not None:
+                if prefix == "item.parsed_dialogue.item.id":
+                    dlg["id"] = value
+                elif prefix == "item.parsed_dialogue.item.paddle_bbox.y1":
+                    dlg["paddle_bbox"] = {"y1": value}
+            elif event in ("string", "number"):
+                key = prefix.rpartition(".")[2]
+                if key in wanted and prefix == f"item.{key}":
+                    data[key] = value
+    return data
+
+
+def _next_version(out_dir: Path) -> int:
+    """
+    Next free N for out_dir/vN.mp4, found with a single scandir pass
+    (one getdents batch, no per-entry pathlib allocation).
+    """
+    best = 0
+    try:
+        with os.scandir(out_dir) as it:
+            for e in it:
+                if e.name.endswith(".mp4"):
+                    m = _VER_RE.match(e.name)
+                    if m:
+                        best = max(best, int(m.group(1)))
+    except FileNotFoundError:
+        pass
+    return best + 1
 
 
 class ChapterVideoBuilder:
@@ -15,39 +88,137 @@ class ChapterVideoBuilder:
         self.res_w, self.res_h = resolution
         self.safe_margin = safe_margin
         self.config = config
+        # (path, seconds, sr) -> Path; skips re-stat'ing a silence file this
+        # process already wrote/verified. Keyed per path: chapters must not
+        # resolve to each other's files, or the digested mtimes (and thus
+        # manifest reuse) become dependent on render order
+        self._silence_cache: Dict[Tuple[str, float, int], Path] = {}
+        # warm render pool, reused across build_run calls
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_workers = 0
+
+    def _render_pool(self, max_workers: int) -> ThreadPoolExecutor:
+        """
+        Shared worker pool for chapter renders. Reusing it across build_run
+        calls keeps the workers warm instead of paying pool setup/teardown
+        per run; a true long-lived ffmpeg daemon is not practical with the
+        CLI (one NVENC session per process), but the single-pass render
+        already amortizes session init across a whole chapter.
+        """
+        if self._pool is None or self._pool_workers < max_workers:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+            self._pool = ThreadPoolExecutor(max_workers=max_workers)
+            self._pool_workers = max_workers
+        return self._pool
 
     def _make_silence(self, out_wav: Path, seconds: float, sr: int = 48000) -> Path:
+        """Write a silent stereo 16-bit PCM WAV in-process (no ffmpeg spawn)."""
+        key = (os.fspath(out_wav), round(float(seconds), 6), sr)
+        cached = self._silence_cache.get(key)
+        if cached is not None and cached.exists():
+            return cached
+
+        n_samples = int(sr * seconds)
+        data_bytes = n_samples * 4   # stereo, 2 bytes per sample
+
+        # idempotent across processes: a fresh run must not rewrite (and
+        # mtime-bump) a file an earlier run already wrote, or the chapter
+        # digest changes and the manifest reuse never matches
+        if out_wav.exists() and out_wav.stat().st_size == 44 + data_bytes:
+            self._silence_cache[key] = out_wav
+            return out_wav
+
+        header = struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 36 + data_bytes, b"WAVE",
+            b"fmt ", 16, 1, 2, sr, sr * 4, 4, 16,
+            b"data", data_bytes,
+        )
         out_wav.parent.mkdir(parents=True, exist_ok=True)
-        cmd = f'ffmpeg -y -f lavfi -i anullsrc=r={sr}:cl=stereo -t {seconds} "{out_wav}"'
-        subprocess.run(shlex.split(cmd), check=True)
+        out_wav.write_bytes(header + b"\x00" * data_bytes)
+        self._silence_cache[key] = out_wav
         return out_wav
 
     def _latest_audio(self, dlg_folder: Path) -> Path:
-        """Pick latest vN file by sorting filenames like v1__, v2__, ..."""
-        wavs = list(dlg_folder.glob("*.wav"))
-        if not wavs:
+        """Pick latest vN file from filenames like v1__, v2__, ..."""
+        # single scandir pass with an online max: no intermediate list and
+        # no pathlib object per non-winning entry
+        best_ver, best_path = -1, None
+        with os.scandir(dlg_folder) as it:
+            for e in it:
+                if not e.name.endswith(".wav"):
+                    continue
+                m = _VER_RE.match(e.name)
+                ver = int(m.group(1)) if m else 0
+                if ver > best_ver:
+                    best_ver, best_path = ver, e.path
+        if best_path is None:
             raise FileNotFoundError(f"No audio files in {dlg_folder}")
-        # sort by version number in filename
-        def vnum(p: Path):
-            m = re.match(r"v(\d+)", p.name)
-            return int(m.group(1)) if m else 0
-        return max(wavs, key=vnum)
-
-    def _collect_paths(self, json_file: Path) -> Tuple[Path, List[Path]]:
-        """From OCR JSON → image path + audio files list."""
-        data = json.loads(json_file.read_text())[0]
+        return Path(best_path)
+
+    def _chapter_digest(self, image_path: Path, audio_files: List[Path],
+                        pan_plan: List[Dict[str, Any]]) -> str:
+        """
+        Digest of everything that determines the rendered bytes: source file
+        identity (size + mtime), the pan plan, and the encode params. Used
+        to skip re-rendering chapters whose inputs haven't changed.
+        """
+        h = hashlib.sha256()
+        for p in [image_path] + list(audio_files):
+            st = Path(p).stat()
+            h.update(f"{Path(p).name}:{st.st_size}:{st.st_mtime_ns};".encode())
+        h.update(json.dumps(pan_plan, sort_keys=True).encode())
+        # every knob that alters the rendered bytes belongs here (mirrors
+        # what Timeline._segment_cache_key hashes); a missing one means a
+        # config change gets served a stale cached video
+        cfg = self.config
+        # hash the encoder the render will actually use, not the config
+        # string vcodec_auto may override
+        vcodec = detect_best_encoder() if cfg.vcodec_auto else cfg.vcodec
+        h.update(
+            f"{vcodec}:{cfg.cq}:{cfg.preset}:{cfg.tune}:"
+            f"{cfg.default_fps}:{cfg.pix_fmt}:{cfg.side_margin_px}:"
+            f"single_pass={int(bool(cfg.single_pass))}:"
+            f"{self.res_w}x{self.res_h}".encode()
+        )
+        return h.hexdigest()
+
+    def _collect_paths(self, json_file: Path, data: Dict[str, Any]) -> Tuple[Path, List[Path]]:
+        """From parsed OCR data → image path + audio files list."""
         run_id = data["run_id"]
-        image_path = Path(self.config.input_root) / data["image_rel_path_from_root"] / data["image_file_name"]
+        input_root = self.config.input_root
+        image_path = Path(input_root) / data["image_rel_path_from_root"] / data["image_file_name"]
 
-        # Dialogue audio
+        # Dialogue audio: one directory listing per dialogue. The listings
+        # are independent and syscall-latency bound, so overlap them in a
+        # small thread pool instead of walking the folders serially;
+        # pool.map keeps the dialogue order.
         base_dir = json_file.parent / f"{Path(data['image_file_name']).stem}_jpg"
-        audio_files = []
-        for dlg in data["parsed_dialogue"]:
-            dlg_folder = base_dir / f"dialogue__{dlg['id']}"
-            audio_files.append(self._latest_audio(dlg_folder))
+        dlg_folders = [
+            base_dir / f"dialogue__{dlg['id']}"
+            for dlg in data["parsed_dialogue"]
+        ]
+        if not dlg_folders:
+            return image_path, []
+
+        with ThreadPoolExecutor(max_workers=min(16, len(dlg_folders))) as pool:
+            # cheap batched stat pre-pass: fail fast with ALL missing
+            # folders named, instead of blowing up on the first listing
+            # halfway through a malformed chapter
+            missing = [
+                str(p) for p, ok
+                in zip(dlg_folders, pool.map(os.path.isdir, dlg_folders))
+                if not ok
+            ]
+            if missing:
+                raise FileNotFoundError(
+                    "Missing dialogue audio folder(s): " + ", ".join(missing)
+                )
+            audio_files = list(pool.map(self._latest_audio, dlg_folders))
         return image_path, audio_files
 
-    def _make_pan_plan(self, json_file: Path) -> List[Dict[str, Any]]:
+    def _make_pan_plan(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Compute a monotonic top->bottom pan plan using dialogue bboxes.
         - Starts slightly ABOVE the first dialogue (first_dialog_margin_pct of viewport height).
@@ -55,65 +226,64 @@ class ChapterVideoBuilder:
         - Ensures offset never decreases (monotonic pan).
         Returns: list of {"dlg_id": int, "offset": int}
         """
-        data = json.loads(json_file.read_text(encoding="utf-8"))[0]
         raw_w = int(data["image_width"])
         raw_h = int(data["image_height"])
+        res_w, res_h = self.res_w, self.res_h
+        safe_margin = self.safe_margin
 
-        # After we scale to viewport width (self.res_w), height scales proportionally
-        scaled_h = int(raw_h * self.res_w / raw_w)
-        max_offset = max(0, scaled_h - self.res_h)
+        # After we scale to viewport width (res_w), height scales
+        # proportionally; integer floor-division avoids the float round-trip
+        scaled_h = (raw_h * res_w) // raw_w
+        max_offset = max(0, scaled_h - res_h)
 
         dialogs = [d for d in data["parsed_dialogue"] if d.get("paddle_bbox")]
-        plan: List[Dict[str, Any]] = []
+        if not dialogs:
+            return []
 
-        cur_offset = 0
         first_margin_pct = getattr(self.config, "first_dialog_margin_pct", 0.02)
         try:
             first_margin_pct = float(first_margin_pct)
         except Exception:
             first_margin_pct = 0.02
-        first_margin = int(self.res_h * first_margin_pct)
-
-
-        for idx, dlg in enumerate(dialogs):
-            y = int(dlg["paddle_bbox"]["y1"])
-            # scale y to match the scaled image height
-            y_scaled = int(y * self.res_w / raw_w)
+        first_margin = int(res_h * first_margin_pct)
 
-            if idx == 0:
-                # start a little above the first bubble
-                offset = max(0, y_scaled - first_margin)
-            else:
-                # keep offset non-decreasing; aim to bring the next bubble into view
-                if y_scaled < cur_offset:
-                    offset = cur_offset
-                else:
-                    offset = max(0, y_scaled - self.safe_margin)
-
-            # clamp to the scaled image height bottom
-            offset = min(offset, max_offset)
-            cur_offset = offset
-            plan.append({"dlg_id": dlg["id"], "offset": offset})
+        # vectorized: scale all y1 values at once, aim safe_margin above each
+        # bubble (first bubble uses the smaller first_dialog margin), enforce
+        # the monotonic pan with a running max, clamp to the image bottom
+        ys = np.fromiter(
+            (int(d["paddle_bbox"]["y1"]) for d in dialogs), dtype=np.int64
+        )
+        ys_scaled = ys * res_w // raw_w
+        targets = np.maximum(ys_scaled - safe_margin, 0)
+        targets[0] = max(0, int(ys_scaled[0]) - first_margin)
+        offsets = np.minimum(np.maximum.accumulate(targets), max_offset)
 
-        return plan
+        return [
+            {"dlg_id": dlg["id"], "offset": int(offset)}
+            for dlg, offset in zip(dialogs, offsets)
+        ]
 
-    def build_chapter(self, 
-                      json_file: Path, 
+    def build_chapter(self,
+                      json_file: Path,
                       version: int,
                       *,
                       side_margin_px: Optional[int] = None,
                       verbose: Optional[bool] = None,
                       capture_stderr: Optional[bool] = None,
                       capture_stdout: Optional[bool] = None,
+                      threads: Optional[int] = None,
                       ) -> dict:
         """Build one chapter video from OCR JSON + audios."""
+        # ---- parse the OCR JSON once; both helpers reuse the same dict ----
+        data = _load_chapter_data(json_file)
+
         # ---- collect image + dialogue audio paths (unchanged helpers) ----
-        image_path, audio_files = self._collect_paths(json_file)   # MUST return one file per dialogue, in order
+        image_path, audio_files = self._collect_paths(json_file, data)   # MUST return one file per dialogue, in order
         if not audio_files:
             raise FileNotFoundError(f"No dialogue audio files found for {json_file}")
 
         # ---- make pan plan from bboxes ----
-        pan_plan = self._make_pan_plan(json_file)
+        pan_plan = self._make_pan_plan(data)
         if len(pan_plan) != len(audio_files):
             print(f"[WARN] pan_plan({len(pan_plan)}) != audio_files({len(audio_files)}). "
                 "Will align by min length.")
@@ -127,23 +297,13 @@ class ChapterVideoBuilder:
         out_dir = json_file.parent / "video_output"
         out_dir.mkdir(parents=True, exist_ok=True)
 
-        def _make_silence(out_wav: Path, seconds: float, sr: int = 48000) -> Path:
-            import subprocess, shlex
-            out_wav.parent.mkdir(parents=True, exist_ok=True)
-            # overwrite (-y) to avoid making silence3, silence4, etc.
-            cmd = f'ffmpeg -y -f lavfi -i anullsrc=r={sr}:cl=stereo -t {seconds} "{out_wav}"'
-            subprocess.run(shlex.split(cmd), check=True)
-            return out_wav
-
         if pre_s > 0:
-            pre_sil = out_dir / "silence_pre.wav"
-            _make_silence(pre_sil, pre_s)
+            pre_sil = self._make_silence(out_dir / "silence_pre.wav", pre_s)
             audio_files = [pre_sil] + audio_files
             pan_plan = [{"dlg_id": -1, "offset": 0}] + pan_plan  # keep the camera at the top for preroll
 
         if post_s > 0:
-            post_sil = out_dir / "silence_post.wav"
-            _make_silence(post_sil, post_s)
+            post_sil = self._make_silence(out_dir / "silence_post.wav", post_s)
             audio_files = audio_files + [post_sil]
             if pan_plan:
                 pan_plan = pan_plan + [{"dlg_id": -2, "offset": pan_plan[-1]["offset"]}]
@@ -159,10 +319,36 @@ class ChapterVideoBuilder:
             print(f"  {i:02d}: offset={pp['offset']} (dlg_id={pp['dlg_id']})")
 
         # ---- versioned output filename in the same folder as the JSON ----
-        existing = list(out_dir.glob("v*.mp4"))
-        import re
-        ver = 1 + max([int(m.group(1)) for f in existing if (m := re.search(r"v(\d+)", f.name))] or [0])
-        out_file = out_dir / f"v{ver}.mp4"
+        # the caller (build_run) resolved the version with the one
+        # authoritative directory scan; don't rescan and silently override
+        out_file = out_dir / f"v{version}.mp4"
+
+        # ---- content-hash memoization: reuse an existing vN whose inputs
+        #      and encode params are identical instead of re-rendering ----
+        digest = self._chapter_digest(image_path, audio_files, pan_plan)
+        for manifest in out_dir.glob("v*.manifest.json"):
+            try:
+                if json.loads(manifest.read_text())["digest"] != digest:
+                    continue
+            except Exception:
+                continue
+            existing_mp4 = manifest.with_name(manifest.name.replace(".manifest.json", ".mp4"))
+            if existing_mp4.exists():
+                print(f"[CACHE] inputs unchanged → reusing {existing_mp4.name} as {out_file.name}")
+                try:
+                    os.link(existing_mp4, out_file)
+                except OSError:
+                    shutil.copy2(existing_mp4, out_file)
+                out_file.with_name(f"v{version}.manifest.json").write_text(
+                    json.dumps({"digest": digest})
+                )
+                return {
+                    "runid": None,
+                    "output_file": str(out_file),
+                    "output_folder": str(out_dir),
+                    "num_audio": len(audio_files),
+                    "image": str(image_path),
+                }
 
         # ---- run the render (pass output_dir so video lands next to JSON) ----
         result = self.runner.run_single_img(
@@ -175,7 +361,13 @@ class ChapterVideoBuilder:
             output_dir=out_dir,
             verbose=verbose,
             capture_stderr=capture_stderr,
-            capture_stdout=capture_stdout
+            capture_stdout=capture_stdout,
+            threads=threads
+        )
+
+        # record the digest so identical future runs can reuse this output
+        out_file.with_name(f"v{version}.manifest.json").write_text(
+            json.dumps({"digest": digest})
         )
         return result
 
@@ -190,17 +382,56 @@ class ChapterVideoBuilder:
                   ) -> List[dict]:
         """Find all OCR JSON files under run_id folder and process each."""
         run_dir = Path(self.config.output_root) / run_id
-        json_files = list(run_dir.rglob("ocr_output_with_bboxes.json"))
+        # os.walk + exact name check: rglob fnmatch-es every entry and
+        # allocates a Path per candidate; this only builds Paths for hits
+        json_files = [
+            Path(root) / "ocr_output_with_bboxes.json"
+            for root, _, files in os.walk(run_dir)
+            if "ocr_output_with_bboxes.json" in files
+        ]
         side_margin_px = side_margin_px if side_margin_px else self.config.side_margin_px
         if not side_margin_px:
             side_margin_px = 0
 
-        results = []
+        # resolve versions BEFORE dispatch so parallel workers never race
+        # on the same out_dir scan
+        jobs = []
         for jf in json_files:
             out_dir = jf.parent / "video_output"
             out_dir.mkdir(exist_ok=True)
-            # determine next version number
-            existing = list(out_dir.glob("v*.mp4"))
-            version = 1 + max([int(re.search(r"v(\d+)", f.name).group(1)) for f in existing] or [0])
-            results.append(self.build_chapter(jf, version, verbose=verbose, capture_stderr=capture_stderr, capture_stdout=capture_stdout, side_margin_px=side_margin_px))
-        return results
+            jobs.append((jf, _next_version(out_dir)))
+
+        max_workers = int(getattr(self.config, "max_parallel_renders", 1) or 1)
+        max_workers = max(1, min(max_workers, len(jobs) or 1))
+
+        if max_workers == 1:
+            return [
+                self.build_chapter(jf, version,
+                                   verbose=verbose,
+                                   capture_stderr=capture_stderr,
+                                   capture_stdout=capture_stdout,
+                                   side_margin_px=side_margin_px)
+                for jf, version in jobs
+            ]
+
+        # ffmpeg does the heavy lifting out-of-process, so threads are
+        # enough here (and build_chapter stays a plain bound method — no
+        # pickling needed). max_parallel_renders bounds the ffmpeg fan-out.
+        # divide the CPUs between workers so N parallel ffmpegs don't each
+        # spin up cpu_count threads and oversubscribe the box; an explicit
+        # config threads value wins
+        thread_cap = int(getattr(self.config, "threads", 0) or 0)
+        if not thread_cap:
+            thread_cap = max(1, (os.cpu_count() or 1) // max_workers)
+
+        pool = self._render_pool(max_workers)
+        futures = [
+            pool.submit(self.build_chapter, jf, version,
+                        verbose=verbose,
+                        capture_stderr=capture_stderr,
+                        capture_stdout=capture_stdout,
+                        side_margin_px=side_margin_px,
+                        threads=thread_cap)
+            for jf, version in jobs
+        ]
+        return [f.result() for f in futures]
@@ -1,11 +1,42 @@
 # app/config.py
 
+import functools
+import os
+
 import yaml
 from pathlib import Path
 from app.utils import log_exception
 
+try:
+    # libyaml C loader: 5-20x faster than the pure-Python SafeLoader
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+@functools.lru_cache(maxsize=8)
+def _load_yaml_cached(path_str: str, mtime_ns: int):
+    """Parse a YAML file once per (path, mtime); re-instantiating
+    VideoConfig on the same unchanged file is then free."""
+    with open(path_str, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=_YamlLoader) or {}
+
 
 class VideoConfig:
+    # fixed attribute layout: reads skip the per-instance __dict__, and a
+    # typo'd setting fails loudly instead of creating a new attribute
+    __slots__ = (
+        "root", "config", "output_folder", "default_fps", "max_height",
+        "max_width", "pix_fmt", "sar", "loop", "vcodec", "vcodec_auto",
+        "cq", "preset", "tune", "fade_s", "transition", "audio_fade",
+        "overwrite", "verbose", "capture_stderr", "capture_stdout",
+        "threads", "nvenc_surfaces", "split_encode_mode", "cuda_filters",
+        "single_pass", "ffmpeg_threads",
+        "encode_jobs", "encode_jobs_auto", "resume", "input_root", "output_root",
+        "first_dialog_margin_pct", "pre_roll_seconds", "post_roll_seconds",
+        "side_margin_px", "keep_segments", "max_parallel_renders",
+    )
+
     def __init__(self, config_path="config.yaml"):
         """
         Load video-related configuration from YAML and validate it.
@@ -27,6 +58,9 @@ class VideoConfig:
 
             # Render defaults
             self.vcodec = self.config.get("vcodec", "h264_nvenc")
+            # probe-encode once on this machine and pick the best working
+            # encoder (nvenc > qsv, else libx264) instead of trusting vcodec
+            self.vcodec_auto = self.config.get("vcodec_auto", False)
             self.cq = self.config.get("cq", 23)
             self.preset = self.config.get("preset", "p5")
             self.tune = self.config.get("tune", "hq")
@@ -40,6 +74,36 @@ class VideoConfig:
             self.capture_stderr = self.config.get("capture_stderr", True)
             self.capture_stdout = self.config.get("capture_stdout", False)
 
+            # ffmpeg threading / NVENC pipelining
+            self.threads = self.config.get("threads", 0)          # 0 = ffmpeg auto
+            self.nvenc_surfaces = self.config.get("nvenc_surfaces", 32)
+            # NVENC intra-frame dual-engine split (Ada+); 0 = off
+            self.split_encode_mode = self.config.get("split_encode_mode", 0)
+
+            # upload frames to CUDA once and keep the filter chain on-GPU
+            self.cuda_filters = self.config.get("cuda_filters", False)
+
+            # One ffmpeg invocation per chapter (concat demuxer) vs the
+            # per-segment pipeline with its segment cache
+            self.single_pass = self.config.get("single_pass", True)
+
+            # Segment-pipeline fan-out: how many ffmpeg encoders run at
+            # once, sized so jobs x threads roughly fills the CPU.
+            # 0 (the shipped default) means "compute the formula", so it
+            # must resolve here, not just when the key is absent.
+            self.ffmpeg_threads = self.config.get("ffmpeg_threads", 2)
+            # remember whether the value was auto-derived: the runner only
+            # applies its NVENC session cap to the formula, never to an
+            # explicit user setting
+            self.encode_jobs_auto = not self.config.get("encode_jobs", 0)
+            self.encode_jobs = self.config.get("encode_jobs", 0) or max(
+                1, (os.cpu_count() or 2) // max(1, self.ffmpeg_threads)
+            )
+
+            # reuse completed cached segments from an interrupted run;
+            # False re-encodes everything from scratch
+            self.resume = self.config.get("resume", True)
+
             self.max_width = self.config.get("max_width", 1080)
             self.max_height = self.config.get("max_height", 1920)
             self.input_root = self.config.get("input_root", None)
@@ -50,6 +114,12 @@ class VideoConfig:
             self.side_margin_px = self.config.get("side_margin_px", None)
             self.keep_segments = self.config.get("keep_segments", None)
 
+            # How many chapters may render concurrently (each one drives its
+            # own ffmpeg processes); 1 = the old sequential behaviour
+            self.max_parallel_renders = self.config.get(
+                "max_parallel_renders", max(1, (os.cpu_count() or 2) // 2)
+            )
+
             # Run validation automatically
             self.validate()
 
@@ -65,8 +135,7 @@ class VideoConfig:
             raise FileNotFoundError(f"Missing YAML config: {path}")
 
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                return yaml.safe_load(f) or {}
+            return _load_yaml_cached(str(path), path.stat().st_mtime_ns)
         except yaml.YAMLError as e:
             log_exception(f"YAML syntax error in {path}: {e}")
             raise
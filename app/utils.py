@@ -1,5 +1,7 @@
 from pathlib import Path
+import os
 import time
+import wave
 from rich.console import Console
 import sys
 import threading
@@ -10,8 +12,53 @@ def log_exception(context: str = "Unhandled exception", label: str = "💀"):
     print(f"\n{label} {context}:")
     traceback.print_exc()
 
+# folders already created this process; lets the hot paths skip the
+# stat+mkdir syscalls ensure_folder would otherwise repeat per call
+_ENSURED: set[str] = set()
+
 def ensure_folder(path: Path):
-    path.mkdir(parents=True, exist_ok=True)
+    key = os.path.abspath(os.fspath(path))
+    if key in _ENSURED:
+        return
+    Path(key).mkdir(parents=True, exist_ok=True)
+    _ENSURED.add(key)
+
+def concat_wavs(wav_paths, out_path: Path):
+    """
+    Concatenate uniform PCM WAV files into one, entirely in-process.
+    Returns out_path on success, or None when the inputs aren't all WAVs
+    with matching format (caller falls back to ffmpeg-side concat).
+    """
+    wav_paths = [str(p) for p in wav_paths]
+    fmt = None
+    for p in wav_paths:
+        if not p.lower().endswith(".wav"):
+            return None
+        try:
+            with wave.open(p, "rb") as w:
+                this = (w.getnchannels(), w.getsampwidth(),
+                        w.getframerate(), w.getcomptype())
+        except (wave.Error, EOFError):
+            return None
+        if fmt is None:
+            fmt = this
+        elif this != fmt:
+            return None
+    if fmt is None or fmt[3] != "NONE":
+        return None
+
+    with wave.open(str(out_path), "wb") as out:
+        out.setnchannels(fmt[0])
+        out.setsampwidth(fmt[1])
+        out.setframerate(fmt[2])
+        for p in wav_paths:
+            with wave.open(p, "rb") as w:
+                while True:
+                    chunk = w.readframes(1 << 20)
+                    if not chunk:
+                        break
+                    out.writeframes(chunk)
+    return Path(out_path)
 
 class Timer:
     last_duration = 0.0
@@ -24,6 +71,7 @@ class Timer:
         self.console = Console()
         self.status = None
         self._ticker = None
+        self._stop = threading.Event()
 
     def __enter__(self):
         if self.use_spinner:
@@ -36,14 +84,15 @@ class Timer:
 
         self.start_time = time.perf_counter()
 
-        if self.show_elapsed:
-            # background thread that prints elapsed every second
+        # the spinner already animates; only run the elapsed ticker when
+        # there is no spinner, so long renders don't get a 1 Hz GIL wake-up
+        # from a redundant thread
+        if self.show_elapsed and not self.use_spinner:
             def _tick():
-                while self.start_time is not None:
+                while not self._stop.wait(1):
                     elapsed = time.perf_counter() - self.start_time
                     sys.stdout.write(f"\r⏱ Elapsed: {elapsed:.1f}s")
                     sys.stdout.flush()
-                    time.sleep(1)
             self._ticker = threading.Thread(target=_tick, daemon=True)
             self._ticker.start()
 
@@ -56,10 +105,12 @@ class Timer:
             duration = 0.0
         Timer.last_duration = duration
 
-        # stop ticker
-        self.start_time = None
+        # signal the ticker so it exits promptly instead of sleeping out
+        # its final second
+        self._stop.set()
         if self._ticker and self._ticker.is_alive():
             self._ticker.join(timeout=0.1)
+        self.start_time = None
         print()  # newline after last elapsed print
 
         if self.use_spinner and self.status:
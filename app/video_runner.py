@@ -1,13 +1,71 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
 from pathlib import Path
 from datetime import datetime
 import uuid
 from typing import Optional
 
-from app.backends.ffmpeg_backend import FClip, Timeline
+from app.backends.ffmpeg_backend import FClip, Timeline, detect_best_encoder
 from app.utils import Timer, log_exception, ensure_folder
 from app.config import VideoConfig
 
 
+@dataclass(frozen=True, slots=True)
+class RenderParams:
+    """
+    Fully-resolved settings for one Timeline.render call: config defaults
+    overlaid with the caller's explicit overrides, merged once instead of
+    via a per-field ternary chain.
+    """
+    fps: int
+    vcodec: str
+    cq: int
+    preset: str
+    tune: str
+    pix_fmt: str
+    overwrite: bool
+    verbose: bool
+    capture_stderr: bool
+    capture_stdout: bool
+    side_margin_px: Optional[int]
+    keep_segments: Optional[bool]
+    threads: int
+    nvenc_surfaces: int
+    split_encode_mode: int
+    cuda_filters: bool
+    single_pass: bool
+    encode_jobs: int
+    resume: bool
+
+    @classmethod
+    def from_config(cls, config: VideoConfig, **overrides) -> "RenderParams":
+        base = {
+            "fps": config.default_fps,
+            "vcodec": config.vcodec,
+            "cq": config.cq,
+            "preset": config.preset,
+            "tune": config.tune,
+            "pix_fmt": config.pix_fmt,
+            "overwrite": config.overwrite,
+            "verbose": config.verbose,
+            "capture_stderr": config.capture_stderr,
+            "capture_stdout": config.capture_stdout,
+            "side_margin_px": config.side_margin_px,
+            "keep_segments": config.keep_segments,
+            "threads": config.threads,
+            "nvenc_surfaces": config.nvenc_surfaces,
+            "split_encode_mode": config.split_encode_mode,
+            "cuda_filters": config.cuda_filters,
+            "single_pass": config.single_pass,
+            "encode_jobs": config.encode_jobs,
+            "resume": config.resume,
+        }
+        base.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**base)
+
+
 class VideoRunner:
     def __init__(self, config: VideoConfig):
         """
@@ -38,35 +96,55 @@ class VideoRunner:
         Build a list of FClip objects: one image reused for all audio files.
         Now also applies per-dialogue crop offsets from pan_plan.
         """
-        clips = []
-        for idx, audio_path in enumerate(audio_files):
+        # resolve the config fallbacks and the constant image path once;
+        # they are identical for every clip, so none of it belongs in the
+        # per-clip worker
+        cfg = self.config
+        img_str = os.fspath(image_path)
+        use_loop = loop if loop is not None else cfg.loop
+        use_fps = fps if fps is not None else cfg.default_fps
+        use_max_h = max_h if max_h is not None else cfg.max_height
+        use_max_w = max_w if max_w is not None else cfg.max_width
+        use_sar = sar if sar is not None else cfg.sar
+        use_pix_fmt = pix_fmt if pix_fmt is not None else cfg.pix_fmt
+        use_verbose = verbose if verbose is not None else cfg.verbose
+        use_capture_stderr = capture_stderr if capture_stderr is not None else True
+        use_capture_stdout = capture_stdout if capture_stdout is not None else False
+
+        def _one(idx_audio: tuple[int, str | Path]) -> FClip:
+            idx, audio_path = idx_audio
             try:
                 offset_y = 0
                 if pan_plan and idx < len(pan_plan):
                     offset_y = int(pan_plan[idx].get("offset", 0))
 
-                clip = FClip.from_image_audio(
-                    image_path=str(image_path),
-                    audio_path=str(audio_path),
-                    loop=loop if loop is not None else self.config.loop,
-                    fps=fps if fps is not None else self.config.default_fps,
-                    max_h=max_h if max_h is not None else self.config.max_height,
-                    max_w=max_w if max_w is not None else self.config.max_width,
-                    sar=sar if sar is not None else self.config.sar,
-                    pix_fmt=pix_fmt if pix_fmt is not None else self.config.pix_fmt,
-                    verbose=verbose if verbose is not None else self.config.verbose,
-                    capture_stderr=capture_stderr if capture_stderr is not None else True,
-                    capture_stdout=capture_stdout if capture_stdout is not None else False,
+                return FClip.from_image_audio(
+                    image_path=img_str,
+                    audio_path=audio_path if isinstance(audio_path, str) else os.fspath(audio_path),
+                    loop=use_loop,
+                    fps=use_fps,
+                    max_h=use_max_h,
+                    max_w=use_max_w,
+                    sar=use_sar,
+                    pix_fmt=use_pix_fmt,
+                    verbose=use_verbose,
+                    capture_stderr=use_capture_stderr,
+                    capture_stdout=use_capture_stdout,
                     offset_y=offset_y,                               # NEW
-                    viewport_h=max_h if max_h is not None else self.config.max_height,  # NEW
-                    viewport_w=max_w if max_w is not None else self.config.max_width,   # NEW,
+                    viewport_h=use_max_h,  # NEW
+                    viewport_w=use_max_w,   # NEW,
                     side_margin_px=side_margin_px
                 )
-                clips.append(clip)
             except Exception:
                 log_exception(f"❌ Failed to build clip for audio={audio_path}")
                 raise
-        return clips
+
+        if len(audio_files) > 1:
+            # clip construction is independent per audio file; map keeps
+            # list order and re-raises the first worker exception
+            with ThreadPoolExecutor(max_workers=min(8, len(audio_files))) as pool:
+                return list(pool.map(_one, enumerate(audio_files)))
+        return [_one(pair) for pair in enumerate(audio_files)]
 
 
     def run_single_img(
@@ -97,7 +175,11 @@ class VideoRunner:
         loop: Optional[int] = None,
         capture_stderr: Optional[bool] = None,
         capture_stdout: Optional[bool] = None,
-        keep_segments: Optional[bool] = None
+        keep_segments: Optional[bool] = None,
+        threads: Optional[int] = None,
+        cuda_filters: Optional[bool] = None,
+        single_pass: Optional[bool] = None,
+        resume: Optional[bool] = None
     ) -> dict:
         """
         Run the video pipeline with one image and multiple audio files.
@@ -136,31 +218,38 @@ class VideoRunner:
         # Output path
         out_path = out_dir / out_filename
 
-        # Merge overrides with config
-        params = {
-            "fps": fps if fps is not None else self.config.default_fps,
-            "vcodec": vcodec if vcodec is not None else self.config.vcodec,
-            "cq": cq if cq is not None else self.config.cq,
-            "preset": preset if preset is not None else self.config.preset,
-            "tune": tune if tune is not None else self.config.tune,
-            "pix_fmt": pix_fmt if pix_fmt is not None else self.config.pix_fmt,
-            # "fade_s": fade_s if fade_s is not None else self.config.fade_s,
-            # "transition": transition if transition is not None else self.config.transition,
-            # "audio_fade": audio_fade if audio_fade is not None else self.config.audio_fade,
-            "overwrite": overwrite if overwrite is not None else self.config.overwrite,
-            "verbose": verbose if verbose is not None else self.config.verbose,
-            # "sar": sar if sar is not None else self.config.sar,
-            # "max_w": max_w if max_w is not None else self.config.max_width,
-            # "max_h": max_h if max_h is not None else self.config.max_height,
-            "capture_stderr": capture_stderr if capture_stderr is not None else self.config.capture_stderr,
-            "capture_stdout": capture_stdout if capture_stdout is not None else self.config.capture_stdout,
-            "side_margin_px": side_margin_px if side_margin_px is not None else self.config.side_margin_px,
-            "keep_segments": keep_segments if keep_segments is not None else self.config.keep_segments,
-        }
+        cfg = self.config
+
+        # Resolve the encoder first: explicit override > auto-probe > config
+        if vcodec is not None:
+            use_vcodec = vcodec
+        elif cfg.vcodec_auto:
+            use_vcodec = detect_best_encoder()
+        else:
+            use_vcodec = cfg.vcodec
+
+        # consumer NVENC caps concurrent sessions, so don't let the
+        # auto-sized fan-out exceed what the driver will actually run; an
+        # explicit encode_jobs setting is respected as-is
+        encode_jobs = cfg.encode_jobs
+        if use_vcodec.endswith("_nvenc") and cfg.encode_jobs_auto:
+            encode_jobs = min(encode_jobs, 2)
+
+        # Merge overrides with config in one pass (None = "use config")
+        render_params = RenderParams.from_config(
+            cfg,
+            fps=fps, vcodec=use_vcodec, cq=cq, preset=preset, tune=tune,
+            pix_fmt=pix_fmt, overwrite=overwrite, verbose=verbose,
+            capture_stderr=capture_stderr, capture_stdout=capture_stdout,
+            side_margin_px=side_margin_px, keep_segments=keep_segments,
+            threads=threads, cuda_filters=cuda_filters,
+            single_pass=single_pass, encode_jobs=encode_jobs,
+            resume=resume,
+        )
 
         # Render
         with Timer(f"🎬 Rendering video to {out_path}"):
-            result = timeline.render(out_path=out_path, **params)
+            result = timeline.render(out_path=out_path, **asdict(render_params))
 
         return {
             "runid": run_id,
@@ -169,3 +258,13 @@ class VideoRunner:
             "num_audio": len(audio_files),
             "image": str(image_path)
         }
+
+    async def run_single_img_async(self, *args, **kwargs) -> dict:
+        """
+        Awaitable front for run_single_img: the pipeline itself is
+        subprocess-bound (ffmpeg does the work) and already overlaps its
+        probes/encodes internally, so the async caller just needs it off
+        the event loop. Lets the video server gather several renders:
+        await asyncio.gather(*(runner.run_single_img_async(...) for ...)).
+        """
+        return await asyncio.to_thread(self.run_single_img, *args, **kwargs)